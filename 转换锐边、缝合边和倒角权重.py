@@ -9,26 +9,172 @@ bl_info = {
 }
 
 import bpy
-import bmesh
+import numpy as np
 from bpy.types import Operator, Panel
 from bpy.props import BoolProperty, EnumProperty
 
 # --- 核心辅助函数：兼容不同版本的倒角权重层获取 ---
-def ensure_bevel_layer(bm):
+def _get_bw_layer_legacy(me):
     """
-    安全地获取倒角权重层。
-    兼容 Blender 3.x 和 Blender 4.x/5.x (通用属性系统)。
+    Blender 3.x：倒角权重存储在 MeshEdge.bevel_weight 中。
+    返回可用于 foreach_get/foreach_set 的 (集合, 属性名)。
     """
-    # 方法1: 尝试标准 API (旧版及部分新版兼容)
+    me.use_customdata_edge_bevel = True
+    return me.edges, "bevel_weight"
+
+
+def _get_bw_layer_attr(me):
+    """
+    Blender 4.x/5.x：倒角权重存储为名为 'bevel_weight_edge' 的边浮点属性，不存在时创建。
+    返回可用于 foreach_get/foreach_set 的 (集合, 属性名)。
+    """
+    attr = me.attributes.get("bevel_weight_edge")
+    if attr is None:
+        attr = me.attributes.new("bevel_weight_edge", 'FLOAT', 'EDGE')
+    return attr.data, "value"
+
+
+# 在 register() 中根据 Blender 版本选择一次
+_get_bw_layer = _get_bw_layer_attr
+
+
+def _get_mesh(context):
+    """返回活动的网格物体，活动物体不是网格时返回 None。"""
+    obj = context.active_object
+    if obj is None or obj.type != 'MESH':
+        return None
+    return obj
+
+
+def _has_selected_edges(me):
+    """判断网格是否有选中的边，在切换模式之前调用。"""
+    # 编辑模式下 Blender 会维护选中边的计数（物体模式下该计数恒为 0），无需读取边数据
+    if me.is_editmode:
+        return me.total_edge_sel > 0
+    sel = np.empty(len(me.edges), dtype=bool)
+    me.edges.foreach_get("select", sel)
+    return bool(sel.any())
+
+
+def _edge_masks(me):
+    """
+    一次性读取所有边的选中、锐边和缝合边状态，返回三个布尔数组。
+    需要在物体模式下调用。
+    """
+    n = len(me.edges)
+    sel = np.empty(n, dtype=bool)
+    sharp = np.empty(n, dtype=bool)
+    seam = np.empty(n, dtype=bool)
+    me.edges.foreach_get("select", sel)
+    me.edges.foreach_get("use_edge_sharp", sharp)
+    me.edges.foreach_get("use_seam", seam)
+    return sel, sharp, seam
+
+
+# 布尔边属性在 MeshEdge 上的属性名；倒角权重的存储方式随版本变化，由 _get_bw_layer 提供
+_ATTRS = {
+    'SHARP': 'use_edge_sharp',
+    'SEAM': 'use_seam',
+}
+
+
+# 通用转换支持的转换类型，同时用于 convert_edges() 的参数检查
+_CONVERSION_TYPES = [
+    ('SHARP_TO_BEVEL', "锐边转倒角权重", "将锐边转换为倒角权重"),
+    ('SHARP_TO_SEAM', "锐边转缝合边", "将锐边转换为缝合边"),
+    ('SEAM_TO_SHARP', "缝合边转锐边", "将缝合边转换为锐边"),
+    ('SEAM_TO_BEVEL', "缝合边转倒角权重", "将缝合边转换为倒角权重"),
+]
+
+
+def _convert(me, src, dst, clear):
+    """
+    将选中边中带有 src 属性的边转换为 dst 属性，返回转换的边数。
+    src 为 'SHARP' 或 'SEAM'，dst 为 'SHARP'、'SEAM' 或 'BEVEL'。
+    需要在物体模式下调用。
+    """
+    sel, sharp, seam = _edge_masks(me)
+    flags = {'SHARP': sharp, 'SEAM': seam}
+    src_name = _ATTRS[src]
+    src_arr = flags[src]
+    mask = sel & src_arr
+    modified_count = int(np.count_nonzero(mask))
+    
+    # 没有需要转换的边时直接返回，避免无谓地创建倒角权重属性
+    if modified_count == 0:
+        return 0
+    
+    if dst == 'BEVEL':
+        dst_seq, dst_prop = _get_bw_layer(me)
+        dst_arr = np.empty(len(me.edges), dtype=np.float32)
+        dst_seq.foreach_get(dst_prop, dst_arr)
+        value = 1.0
+    else:
+        dst_seq, dst_prop = me.edges, _ATTRS[dst]
+        dst_arr = flags[dst]
+        value = True
+    
+    # 先在 numpy 数组上完成所有修改，再连续写回，避免交替扫描边数据
+    dst_arr[mask] = value
+    if clear:
+        src_arr[mask] = False
+    
+    dst_seq.foreach_set(dst_prop, dst_arr)
+    if clear:
+        me.edges.foreach_set(src_name, src_arr)
+    
+    return modified_count
+
+
+def convert_edges(me, kind, clear):
+    """
+    转换网格 me 中选中边的属性，返回转换的边数。
+    kind 为 'SHARP_TO_BEVEL'、'SHARP_TO_SEAM'、'SEAM_TO_SHARP' 或 'SEAM_TO_BEVEL'，
+    clear 为 True 时清除原属性。
+    
+    网格必须处于物体模式，否则编辑模式退出时会丢弃这里的修改，因此直接抛出 ValueError。
+    函数不调用 bpy.ops，也不调用 me.update()，调用方需要在转换后自行调用 me.update()。
+    和其他 bpy 数据访问一样，只能在主线程调用。
+    """
+    if me.is_editmode:
+        raise ValueError(f"网格 '{me.name}' 处于编辑模式，请先切换到物体模式")
+    if kind not in {item[0] for item in _CONVERSION_TYPES}:
+        raise ValueError(f"未知的转换类型: {kind!r}")
+    
+    src, dst = kind.split('_TO_')
+    return _convert(me, src, dst, clear)
+
+
+def _run_conversion(op, context, kind, clear, message="转换了 {} 条边"):
+    """
+    对活动网格物体执行一次转换并通过 op 报告结果，返回 execute() 的返回值。
+    message 为带一个 {} 占位符（转换的边数）的提示文本。
+    """
+    obj = _get_mesh(context)
+    
+    if obj is None:
+        op.report({'WARNING'}, "请选择一个网格物体")
+        return {'CANCELLED'}
+    
+    if not _has_selected_edges(obj.data):
+        op.report({'WARNING'}, "没有选中的边")
+        return {'CANCELLED'}
+    
+    # 切换到物体模式，编辑模式下的修改会写回 obj.data，之后即可直接批量读写边属性
+    prev_mode = obj.mode
+    if prev_mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
     try:
-        return bm.edges.layers.bevel_weight.verify()
-    except AttributeError:
-        # 方法2: 如果标准属性不存在 (Blender 5.0+ 可能出现)，使用通用浮点层
-        # 倒角权重在内部通常存储为名为 'bevel_weight_edge' 的浮点层
-        layer = bm.edges.layers.float.get("bevel_weight_edge")
-        if not layer:
-            layer = bm.edges.layers.float.new("bevel_weight_edge")
-        return layer
+        modified_count = convert_edges(obj.data, kind, clear)
+        obj.data.update()
+    finally:
+        # 转换出错时也要恢复原来的模式，避免用户停留在物体模式
+        if prev_mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode=prev_mode)
+    
+    op.report({'INFO'}, message.format(modified_count))
+    return {'FINISHED'}
+
 
 class MESH_OT_convert_edge_attributes(Operator):
     """转换边属性"""
@@ -39,12 +185,7 @@ class MESH_OT_convert_edge_attributes(Operator):
     conversion_type: EnumProperty(
         name="转换类型",
         description="选择要执行的转换类型",
-        items=[
-            ('SHARP_TO_BEVEL', "锐边转倒角权重", "将锐边转换为倒角权重"),
-            ('SHARP_TO_SEAM', "锐边转缝合边", "将锐边转换为缝合边"),
-            ('SEAM_TO_SHARP', "缝合边转锐边", "将缝合边转换为锐边"),
-            ('SEAM_TO_BEVEL', "缝合边转倒角权重", "将缝合边转换为倒角权重"),
-        ],
+        items=_CONVERSION_TYPES,
         default='SHARP_TO_BEVEL'
     )
     
@@ -55,70 +196,14 @@ class MESH_OT_convert_edge_attributes(Operator):
     )
     
     def execute(self, context):
-        obj = context.active_object
-        
-        if obj is None or obj.type != 'MESH':
-            self.report({'WARNING'}, "请选择一个网格物体")
-            return {'CANCELLED'}
-        
-        # 确保在编辑模式
-        if context.mode != 'EDIT_MESH':
-            bpy.ops.object.mode_set(mode='EDIT')
-        
-        # 获取编辑模式的网格数据
-        bm = bmesh.from_edit_mesh(obj.data)
-        
-        # --- 修复点：先确保倒角层存在，再获取边 ---
-        # 如果先获取边再加层，会导致边的引用（指针）失效
-        bw_layer = None
-        if 'BEVEL' in self.conversion_type:
-            bw_layer = ensure_bevel_layer(bm)
-        
-        # 获取选中的边 (必须在 ensure_bevel_layer 之后)
-        selected_edges = [edge for edge in bm.edges if edge.select]
-        
-        if not selected_edges:
-            self.report({'WARNING'}, "没有选中的边")
-            return {'CANCELLED'}
-        
-        modified_count = 0
-        
-        for edge in selected_edges:
-            if self.conversion_type == 'SHARP_TO_BEVEL':
-                if edge.smooth == False:  # 锐边
-                    edge[bw_layer] = 1.0
-                    modified_count += 1
-                    if self.clear_original:
-                        edge.smooth = True
-            
-            elif self.conversion_type == 'SHARP_TO_SEAM':
-                if edge.smooth == False:  # 锐边
-                    edge.seam = True
-                    modified_count += 1
-                    if self.clear_original:
-                        edge.smooth = True
-            
-            elif self.conversion_type == 'SEAM_TO_SHARP':
-                if edge.seam:  # 缝合边
-                    edge.smooth = False
-                    modified_count += 1
-                    if self.clear_original:
-                        edge.seam = False
-            
-            elif self.conversion_type == 'SEAM_TO_BEVEL':
-                if edge.seam:  # 缝合边
-                    edge[bw_layer] = 1.0
-                    modified_count += 1
-                    if self.clear_original:
-                        edge.seam = False
-        
-        # 更新网格
-        bmesh.update_edit_mesh(obj.data)
-        
-        self.report({'INFO'}, f"成功转换 {modified_count} 条边")
-        return {'FINISHED'}
+        return _run_conversion(self, context, self.conversion_type, self.clear_original,
+                               "成功转换 {} 条边")
     
     def invoke(self, context, event):
+        # 脚本调用时已指定转换类型，直接执行，不弹出对话框
+        if self.properties.is_property_set("conversion_type"):
+            return self.execute(context)
+        
         wm = context.window_manager
         return wm.invoke_props_dialog(self)
 
@@ -137,39 +222,7 @@ class MESH_OT_quick_convert_sharp_to_bevel(Operator):
     )
     
     def execute(self, context):
-        obj = context.active_object
-        
-        if obj is None or obj.type != 'MESH':
-            self.report({'WARNING'}, "请选择一个网格物体")
-            return {'CANCELLED'}
-        
-        if context.mode != 'EDIT_MESH':
-            bpy.ops.object.mode_set(mode='EDIT')
-        
-        bm = bmesh.from_edit_mesh(obj.data)
-
-        # --- 修复点：先创建层 ---
-        bw_layer = ensure_bevel_layer(bm)
-
-        # --- 后收集边 ---
-        selected_edges = [edge for edge in bm.edges if edge.select]
-        
-        if not selected_edges:
-            self.report({'WARNING'}, "没有选中的边")
-            return {'CANCELLED'}
-        
-        modified_count = 0
-        
-        for edge in selected_edges:
-            if edge.smooth == False:  # 锐边
-                edge[bw_layer] = 1.0
-                modified_count += 1
-                if self.clear_original:
-                    edge.smooth = True
-        
-        bmesh.update_edit_mesh(obj.data)
-        self.report({'INFO'}, f"转换了 {modified_count} 条边")
-        return {'FINISHED'}
+        return _run_conversion(self, context, 'SHARP_TO_BEVEL', self.clear_original)
 
 
 class MESH_OT_quick_convert_sharp_to_seam(Operator):
@@ -186,34 +239,7 @@ class MESH_OT_quick_convert_sharp_to_seam(Operator):
     )
     
     def execute(self, context):
-        obj = context.active_object
-        
-        if obj is None or obj.type != 'MESH':
-            self.report({'WARNING'}, "请选择一个网格物体")
-            return {'CANCELLED'}
-        
-        if context.mode != 'EDIT_MESH':
-            bpy.ops.object.mode_set(mode='EDIT')
-        
-        bm = bmesh.from_edit_mesh(obj.data)
-        selected_edges = [edge for edge in bm.edges if edge.select]
-        
-        if not selected_edges:
-            self.report({'WARNING'}, "没有选中的边")
-            return {'CANCELLED'}
-        
-        modified_count = 0
-        
-        for edge in selected_edges:
-            if edge.smooth == False:  # 锐边
-                edge.seam = True
-                modified_count += 1
-                if self.clear_original:
-                    edge.smooth = True
-        
-        bmesh.update_edit_mesh(obj.data)
-        self.report({'INFO'}, f"转换了 {modified_count} 条边")
-        return {'FINISHED'}
+        return _run_conversion(self, context, 'SHARP_TO_SEAM', self.clear_original)
 
 
 class MESH_OT_quick_convert_seam_to_sharp(Operator):
@@ -230,34 +256,7 @@ class MESH_OT_quick_convert_seam_to_sharp(Operator):
     )
     
     def execute(self, context):
-        obj = context.active_object
-        
-        if obj is None or obj.type != 'MESH':
-            self.report({'WARNING'}, "请选择一个网格物体")
-            return {'CANCELLED'}
-        
-        if context.mode != 'EDIT_MESH':
-            bpy.ops.object.mode_set(mode='EDIT')
-        
-        bm = bmesh.from_edit_mesh(obj.data)
-        selected_edges = [edge for edge in bm.edges if edge.select]
-        
-        if not selected_edges:
-            self.report({'WARNING'}, "没有选中的边")
-            return {'CANCELLED'}
-        
-        modified_count = 0
-        
-        for edge in selected_edges:
-            if edge.seam:  # 缝合边
-                edge.smooth = False
-                modified_count += 1
-                if self.clear_original:
-                    edge.seam = False
-        
-        bmesh.update_edit_mesh(obj.data)
-        self.report({'INFO'}, f"转换了 {modified_count} 条边")
-        return {'FINISHED'}
+        return _run_conversion(self, context, 'SEAM_TO_SHARP', self.clear_original)
 
 
 class MESH_OT_quick_convert_seam_to_bevel(Operator):
@@ -274,39 +273,7 @@ class MESH_OT_quick_convert_seam_to_bevel(Operator):
     )
     
     def execute(self, context):
-        obj = context.active_object
-        
-        if obj is None or obj.type != 'MESH':
-            self.report({'WARNING'}, "请选择一个网格物体")
-            return {'CANCELLED'}
-        
-        if context.mode != 'EDIT_MESH':
-            bpy.ops.object.mode_set(mode='EDIT')
-        
-        bm = bmesh.from_edit_mesh(obj.data)
-
-        # --- 修复点：先创建层 ---
-        bw_layer = ensure_bevel_layer(bm)
-
-        # --- 后收集边 ---
-        selected_edges = [edge for edge in bm.edges if edge.select]
-        
-        if not selected_edges:
-            self.report({'WARNING'}, "没有选中的边")
-            return {'CANCELLED'}
-        
-        modified_count = 0
-        
-        for edge in selected_edges:
-            if edge.seam:  # 缝合边
-                edge[bw_layer] = 1.0
-                modified_count += 1
-                if self.clear_original:
-                    edge.seam = False
-        
-        bmesh.update_edit_mesh(obj.data)
-        self.report({'INFO'}, f"转换了 {modified_count} 条边")
-        return {'FINISHED'}
+        return _run_conversion(self, context, 'SEAM_TO_BEVEL', self.clear_original)
 
 
 class VIEW3D_PT_edge_conversion_tools(Panel):
@@ -320,16 +287,12 @@ class VIEW3D_PT_edge_conversion_tools(Panel):
     
     @classmethod
     def poll(cls, context):
-        return context.active_object is not None and context.active_object.type == 'MESH'
+        return _get_mesh(context) is not None
     
     def draw(self, context):
         layout = self.layout
         scene = context.scene
         
-        # 添加属性到场景以便面板访问
-        if not hasattr(scene, "edge_clear_original"):
-            scene.edge_clear_original = True
-        
         box = layout.box()
         box.label(text="批量转换:", icon='MODIFIER')
         
@@ -383,7 +346,7 @@ class VIEW3D_PT_edge_conversion_object_tools(Panel):
     
     @classmethod
     def poll(cls, context):
-        return context.active_object is not None and context.active_object.type == 'MESH'
+        return _get_mesh(context) is not None
     
     def draw(self, context):
         layout = self.layout
@@ -425,16 +388,22 @@ classes = (
     VIEW3D_PT_edge_conversion_object_tools,
 )
 
+_register_classes, _unregister_classes = bpy.utils.register_classes_factory(classes)
+
 
 def register():
+    global _get_bw_layer
+    if bpy.app.version < (4, 0, 0):
+        _get_bw_layer = _get_bw_layer_legacy
+    else:
+        _get_bw_layer = _get_bw_layer_attr
+    
     init_properties()
-    for cls in classes:
-        bpy.utils.register_class(cls)
+    _register_classes()
 
 
 def unregister():
-    for cls in reversed(classes):
-        bpy.utils.unregister_class(cls)
+    _unregister_classes()
     clear_properties()
 
 